@@ -0,0 +1,135 @@
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import contextlib
+import io
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from model import Model, model_bp, model_lp_gen
+from labpy.types import Series, DataList
+
+stages = ('freq_estimate', 'filter_kernels', 'filter', 'estimates_bp',
+          'estimates_lp', 'fit_bp', 'fit_lp')
+'''Stages traced by `Model`, reported with exclusive times'''
+
+results_dir = Path(__file__).parent / 'results'
+
+truth_default = {'r': 1., 'gr': 30., 'ph': 0.5,
+                 'c1': 2., 'g1': 5., 'c2': -1., 'g2': 30., 'off': 0.1}
+
+bounds_default = {'gr': [15., 50.], 'g1': [2., 10.], 'g2': [15., 50.]}
+
+def synth_data(shots, samp_freq, length, osc_freq, noise, truth=truth_default,
+               field_coef=4e6, seed=0):
+    '''Generate a DataList of `shots` entries with channel `x` following
+    `model_bp` + `model_lp_gen` with gaussian noise of standard deviation `noise`.
+    Phase is randomized per shot. Returns data and list of true parameters.'''
+    rng = np.random.default_rng(seed)
+    data = DataList()
+    data.settings = {'current_source': {'sweep': [0., osc_freq / field_coef],
+                                        'field_coef': field_coef}}
+    x = np.arange(int(round(length * samp_freq))) / samp_freq
+    truths = []
+    for _ in range(shots):
+        p = dict(truth, f=osc_freq, ph=rng.uniform(-np.pi, np.pi))
+        y = model_bp(x, *[p[k] for k in ('r', 'gr', 'f', 'ph')]) \
+            + model_lp_gen()(x, *[p[k] for k in ('c1', 'g1', 'c2', 'g2', 'off')])
+        y += rng.normal(0., noise, len(x))
+        data.append({'settings': {}, 'x': Series(y, x)})
+        truths.append(p)
+    return data, truths
+
+def fit_errors(result, truths, params):
+    '''Absolute errors of best fit parameters against truth (phase wrapped to [-pi, pi)).'''
+    err = {k: [] for k in params}
+    for res, truth in zip(result, truths):
+        for k in params:
+            e = res['best fit'][k] - truth[k]
+            if k == 'ph':
+                e = (e + np.pi) % (2 * np.pi) - np.pi
+            err[k].append(e)
+    return err
+
+def run(args):
+    data, truths = synth_data(args.shots, args.freq, args.time, args.osc_freq,
+                              args.noise, seed=args.seed)
+    model = Model(data, bounds=bounds_default)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.process()
+    total = time.perf_counter() - start
+    samples = sum(len(shot['x'].y) for shot in data)
+    err = fit_errors(model.result, truths, model.params)
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'comment': args.comment,
+        'config': {'shots': args.shots, 'freq': args.freq, 'time': args.time,
+                   'osc_freq': args.osc_freq, 'noise': args.noise, 'seed': args.seed},
+        'total': total,
+        'throughput': {'shots/s': args.shots / total, 'samples/s': samples / total},
+        'stages': {k: {'total': v['self total'], 'median': v['self median'], 'n': v['n']}
+                   for k, v in model.trace['stages'].items()},
+        'accuracy': {k: {'rms': float(np.sqrt(np.mean(np.square(v)))),
+                         'bias': float(np.mean(v))} for k, v in err.items()},
+    }
+
+def report(res):
+    print(f"total: {res['total']:.3f} s, "
+          f"{res['throughput']['shots/s']:.2f} shots/s, "
+          f"{res['throughput']['samples/s']:.3g} samples/s")
+    print(f"{'stage':<22}{'total [s]':>12}{'median [ms]':>14}{'n':>6}")
+    for k in stages:
+        if k in res['stages']:
+            s = res['stages'][k]
+            print(f"{k:<22}{s['total']:>12.4f}{s['median']*1e3:>14.3f}{s['n']:>6}")
+    print(f"{'param':<22}{'rms err':>12}{'bias':>14}")
+    for k, a in res['accuracy'].items():
+        print(f"{k:<22}{a['rms']:>12.4g}{a['bias']:>14.4g}")
+
+def save(res, dir):
+    savepath = Path(dir) / ("B" + datetime.now().strftime("%y%m%d_%H%M%S")
+                            + res['comment'] + ".json")
+    savepath.parent.mkdir(exist_ok=True, parents=True)
+    with savepath.open("w") as f:
+        json.dump(res, f, indent=1)
+    return savepath
+
+def compare(dir):
+    '''Print stage medians and throughput of all stored runs, oldest first.'''
+    paths = sorted(Path(dir).glob("B*.json"))
+    cols = ['shots/s'] + list(stages)
+    print(f"{'run':<28}" + "".join(f"{c:>16}" for c in cols))
+    for path in paths:
+        with path.open("r") as f:
+            res = json.load(f)
+        row = [res['throughput']['shots/s']] \
+            + [res['stages'].get(k, {}).get('median', np.nan) * 1e3 for k in stages]
+        print(f"{path.stem:<28}" + "".join(f"{v:>16.3f}" for v in row))
+
+def main(args):
+    if args.compare:
+        compare(args.dir)
+        return
+    res = run(args)
+    report(res)
+    if not args.no_save:
+        print("saved:", save(res, args.dir))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Model.process on synthetic data"
+        , formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("-n", "--shots", type=int, default=5, help="Number of shots")
+    parser.add_argument("-f", "--freq", type=float, default=40e3, help="Sample rate in Hz")
+    parser.add_argument("-t", "--time", type=float, default=0.2, help="Record length in seconds")
+    parser.add_argument("-o", "--osc-freq", type=float, default=400., help="Oscillation frequency in Hz")
+    parser.add_argument("-s", "--noise", type=float, default=0.05, help="Noise standard deviation")
+    parser.add_argument("--seed", type=int, default=0, help="Random generator seed")
+    parser.add_argument("-c", "--comment", default="", help="Append COMMENT to saved file name")
+    parser.add_argument("-d", "--dir", default=results_dir, help="Results directory")
+    parser.add_argument("--no-save", action="store_true", help="Don't store results")
+    parser.add_argument("--compare", action="store_true", help="Compare stored runs and exit")
+    args = parser.parse_args()
+    main(args)
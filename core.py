@@ -11,6 +11,8 @@ from pathlib import Path
 from datetime import datetime
 import constants
 import settings as stngs
+import pyramid
+from tracing import Tracer
 from labpy.devices import daqmx, arduinopulsegen, keithley_cs, srs, tb3000_aom_driver, wavemeter
 from labpy.types import Series, Average, NestedDict, DataList
 from labpy import utils
@@ -23,6 +25,8 @@ class Core:
             settings = stngs.load(sett_path)
         self._s = NestedDict(settings)
         self._args = args if args else parser.parse_args()
+        self.tracer = Tracer()
+        self._run_spans = 0
         self._apply_args()
 
     def _apply_args(self, args):
@@ -179,14 +183,31 @@ class Core:
             savepath = Path("data/" + dir.strip("/\\") + '/' + "M"
                 + datetime.now().strftime("%y%m%d_%H%M%S") + comment + ".pickle")
             savepath.parent.mkdir(exist_ok=True, parents=True)
-            with savepath.open("wb") as f:
+            # Drop spans of previous saves, so each file gets timing of its own save only.
+            # Save and pyramid timing can't be stored in the pickled data (result.trace
+            # is set at the end of run), it is available only in the exported trace.
+            self.tracer.rewind(self._run_spans)
+            with self.tracer.span('save'), savepath.open("wb") as f:
                 pickle.dump(self.result, f)
+            try:
+                with self.tracer.span('pyramid'):
+                    pyramid.save(self.result, pyramid.path_for(savepath))
+            except Exception as e:
+                print(f"Pyramid not saved: {type(e).__name__}: {e}")
+            self.export_trace()
+
+    def export_trace(self, path=None):
+        path = path if path is not None else self._args.trace
+        if path:
+            self.tracer.export_chrome(path)
 
     def export_settings(self, filename='exported'):
         stngs.save(self.result.settings, "settings/" + filename + '.json')
 
     def run(self, scan:dict[list]=None, plots:dict={}, grid_specs:dict={}, normalize=True):
         self._init_devices()
+        self.tracer.clear()
+        tr = self.tracer
 
         self.result = DataList()
         if scan is not None:
@@ -195,47 +216,62 @@ class Core:
         else:
             scan_list = [{}]
         self.result.settings = self._s.copy()
-        self.result.params = self.snap_params()
+        with tr.span('wavemeter'):
+            self.result.params = self.snap_params()
         plt.ion()
         figs = Core._create_figures(plots, grid_specs)
         t = self.daq.space()
 
-        for shot_sett in scan_list:
+        for point, shot_sett in enumerate(scan_list):
             entry = {}
             avgs = {k: Average() for k, _
                 in zip(constants.daq.labels, range(self.daq.chs_n))}
-            self.set(shot_sett)
+            with tr.span('set', point=point):
+                self.set(shot_sett)
             # entry['settings'] = self._s.copy() # Save full settings
             entry['settings'] = shot_sett # Save shot settings only
-            entry['params'] = self.snap_params()
-            for _ in range(self._s["averages"]):
-                self.curr_src.init()
-                self.daq.start()
-                time.sleep(-self.daq.t0)
-                self.pulsegen.run()
-                data = self.daq.read()
-                series = dict(zip(constants.daq.labels, Series.from2darray(data, t)))
-                for k, ser in series.items():
-                    avgs[k].add(ser)
-                if self._s['averages'] != 1:
-                    Core._plot(series, **figs.get('single', {}))
+            with tr.span('wavemeter', point=point):
+                entry['params'] = self.snap_params()
+            for shot in range(self._s["averages"]):
+                with tr.span('shot', point=point, shot=shot):
+                    with tr.span('trigger', point=point, shot=shot):
+                        self.curr_src.init()
+                        self.daq.start()
+                        time.sleep(-self.daq.t0)
+                        self.pulsegen.run()
+                    with tr.span('daq.read', point=point, shot=shot):
+                        data = self.daq.read()
+                    series = dict(zip(constants.daq.labels, Series.from2darray(data, t)))
+                    with tr.span('average', point=point, shot=shot):
+                        for k, ser in series.items():
+                            avgs[k].add(ser)
+                    if self._s['averages'] != 1:
+                        with tr.span('plot', point=point, shot=shot):
+                            Core._plot(series, **figs.get('single', {}))
             series_avg = {k: v.value for k, v in avgs.items()}
             entry.update(series_avg)
             self.result.append(entry)
-            Core._plot(entry, **figs.get('avg', {}))
+            with tr.span('plot', point=point):
+                Core._plot(entry, **figs.get('avg', {}))
         if normalize:
             input('Obstruct one photodiode channel and press enter...')
-            for shot_sett, entry in zip(scan_list, self.result):
-                self.set(shot_sett)
-                self.lockin.setup(self._s['lockin']['normalization'])
-                self.curr_src.init()
-                self.daq.start()
-                time.sleep(-self.daq.t0)
-                self.pulsegen.run()
-                data = self.daq.read()
+            for point, (shot_sett, entry) in enumerate(zip(scan_list, self.result)):
+                with tr.span('norm.set', point=point):
+                    self.set(shot_sett)
+                    self.lockin.setup(self._s['lockin']['normalization'])
+                with tr.span('norm.trigger', point=point):
+                    self.curr_src.init()
+                    self.daq.start()
+                    time.sleep(-self.daq.t0)
+                    self.pulsegen.run()
+                with tr.span('norm.daq.read', point=point):
+                    data = self.daq.read()
                 series = dict(zip(constants.daq.labels, Series.from2darray(data, t)))
                 entry['x_norm'] = series['x']
                 entry['y_norm'] = series['y']
+        self.result.trace = tr.summary()
+        self._run_spans = len(tr.spans)
+        self.export_trace()
 
 def scan_dict(paths: list[str|tuple]):
     scan = {}
@@ -257,5 +293,7 @@ parser.add_argument("-se", "--sensitivity", default=None
     , help="Lock-in sensitivity, formatted as string with unit, e.g '200 uV'", metavar='STR')
 parser.add_argument("-p", "--probe", type=float, default=None
     , help="Probe AOM amplitude (in percents)", metavar='AMPLITUDE')
+parser.add_argument("-t", "--trace", default=None
+    , help="Export Chrome trace JSON of run stages to FILE", metavar="FILE")
 parser.add_argument("-l", "--list", action="store_true", help="List available devices and exit")
 parser.add_argument("-a", "--aom", action="store_true", help="Enable AOMs operation and exit")
@@ -5,10 +5,11 @@ from scipy.optimize import differential_evolution, curve_fit
 from labpy.types import Series, NestedDict, DataList
 from labpy import dsp
 from labpy import utils
+from tracing import Tracer
 
 class Model:
 
-    def __init__(self, data: DataList, idx='x', bounds={}, verbose=False):
+    def __init__(self, data: DataList, idx='x', bounds={}, verbose=False, tracer: Tracer = None):
         self._data = data
         self._meta = data.meta
         self._settings = NestedDict(data.settings)
@@ -21,6 +22,11 @@ class Model:
                              'filter_atten_dB': 52., 'lp_est_dec_freq': 1e3}
         self.result = []
         '''list[dict]: Model fit results'''
+        self._own_tracer = tracer is None
+        self.tracer = tracer if tracer is not None else Tracer()
+        '''Tracer: Records timing of processing stages'''
+        self.trace = {}
+        '''dict: Summary of processing stages timing, see `Tracer.summary`'''
         # self.osc_freq = data.settings['current_source']['sweep'][-1] \
         #                 * data.settings['current_source'].get('field_coef', 4e6)
 
@@ -42,37 +48,47 @@ class Model:
         '''Process measruements (e.g. normalize) and fit model.
         Result is stored in `result` attribute
         '''
-        self.result = [self._process_shot(shot) for shot in self._data]
+        if self._own_tracer:
+            self.tracer.clear()
+        self.result = [self._process_shot(shot, i) for i, shot in enumerate(self._data)]
+        self.trace = self.tracer.summary()
 
-    def _process_shot(self, shot: dict):
+    def _process_shot(self, shot: dict, shot_id=None):
+        tr = self.tracer
         settings = self._settings
         settings.shadow = shot['settings']
         idx = self._idx
         rot: Series = shot[idx]
         samp_freq = rot.freq
-        osc_freq = self._freq_estimate(rot)
+        with tr.span('freq_estimate', shot=shot_id):
+            osc_freq = self._freq_estimate(rot)
         print(f'osc_freq: {osc_freq:.3f} Hz')
-        kerlp, kerbp = self._calc_filter_kernels(samp_freq, osc_freq)
+        with tr.span('filter_kernels', shot=shot_id):
+            kerlp, kerbp = self._calc_filter_kernels(samp_freq, osc_freq)
         dead_time = len(kerlp) / samp_freq / 2
         if self._v: print(f'dead_time: {dead_time*1e3:.3f} ms')
-        rotlp = dsp.filter(rot, kerlp).cut(dead_time, -dead_time)
-        rotbp = dsp.filter(rot, kerbp).cut(dead_time, -dead_time)
+        with tr.span('filter', shot=shot_id):
+            rotlp = dsp.filter(rot, kerlp).cut(dead_time, -dead_time)
+            rotbp = dsp.filter(rot, kerbp).cut(dead_time, -dead_time)
         if idx + '_norm' in shot:
             # Filter normalization data and normalize rotlp and rotbp
             print("Normalization not implemented. Normalization data ignored.")
         else:
             if self._v: print('No normalization data. Fitting to raw signal.')
-        bp_best_fit, bp_sd = self._fit_bp(rotbp, osc_freq)
-        lp_best_fit, lp_sd = self._fit_lp(rotlp)
+        with tr.span('fit_bp', shot=shot_id):
+            bp_best_fit, bp_sd = self._fit_bp(rotbp, osc_freq, shot_id)
+        with tr.span('fit_lp', shot=shot_id):
+            lp_best_fit, lp_sd = self._fit_lp(rotlp, shot_id)
         # best_fit_l = list(bp_best_fit) + list(lp_best_fit)
         # fit_sd_l = list(np.sqrt(np.diag(bp_cov_matrix))) + list(np.sqrt(np.diag(lp_cov_matrix)))
         best_fit = dict(zip(self.params, bp_best_fit + lp_best_fit))
         fit_sd = dict(zip(self.params, bp_sd + lp_sd))
         return {'best fit': best_fit, 'fit sd': fit_sd}
 
-    def _fit_lp(self, rot):        
+    def _fit_lp(self, rot, shot_id=None):
         bounds = self._bounds_lp(rot)
-        estimates = self._estimates_lp(rot, bounds)
+        with self.tracer.span('estimates_lp', shot=shot_id):
+            estimates = self._estimates_lp(rot, bounds)
         if self._v: print('lp est:', estimates)
         model = model_lp_gen()
         res = curve_fit(model, *rot.xy, estimates, bounds=list(zip(*bounds)))
@@ -94,9 +110,10 @@ class Model:
         res = [model.full_params(p) for p in res]
         return res
 
-    def _fit_bp(self, rot, osc_freq):
+    def _fit_bp(self, rot, osc_freq, shot_id=None):
         bounds = self._bounds_bp(rot, osc_freq)
-        estimates = self._estimates_bp(rot, osc_freq, bounds)
+        with self.tracer.span('estimates_bp', shot=shot_id):
+            estimates = self._estimates_bp(rot, osc_freq, bounds)
         if self._v: print('bp est:', estimates)
         res = curve_fit(model_bp, *rot.xy, estimates, bounds=list(zip(*bounds)))        
         res = [list(res[0]), list(np.sqrt(np.diag(res[1])))]
@@ -1,29 +1,36 @@
 import numpy as np
 import pickle
 import argparse
+import glob
+import os
+from functools import lru_cache
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import matplotlib.pyplot as plt
 import scipy.signal as dsp
 from labpy.series import Series
 import labpy.utils as utils
-from statsmodels.tsa.ar_model import AutoReg
 
-def main(args):
-    with open(args.file, "rb") as f:
-        data = pickle.load(f)
+tau = 5e-3
+
+@lru_cache
+def kernels(freq, numtaps):
+    '''Filter kernels for given sample rate, cached so files with matching rates reuse them'''
+    ker = dsp.firwin(numtaps, 100, fs=freq, scale=True)
+    kerbp = dsp.firwin(numtaps, (300, 500), fs=freq, pass_zero=False)
+    kerbp2 = dsp.firwin(numtaps, (200, 600), fs=freq, pass_zero=False)
+    return ker, kerbp, kerbp2
+
+def process(data):
     sers = data["data"]
-    if args.params: print(data["params"])
-    if args.settings: print(data["settings"])
     sens = utils.str_to_value(data['settings']['lockin']['sensitivity'])
-    
-    tau = 5e-3
+
     dmx: Series = (sers['x'] * sens).slice(-tau)
     cut = 5e-3
     # dmx.project(cut, 5e-4)
     # sers['back_proj'] = dmx.copy_y()
 
-    ker = dsp.firwin(int(2 * tau // dmx.dx), 100, fs=dmx.freq, scale=True)
-    kerbp = dsp.firwin(int(2 * tau // dmx.dx), (300, 500), fs=dmx.freq, pass_zero=False)
-    kerbp2 = dsp.firwin(int(2 * tau // dmx.dx), (200, 600), fs=dmx.freq, pass_zero=False)
+    ker, kerbp, kerbp2 = kernels(dmx.freq, int(2 * tau // dmx.dx))
     sers['filter'] = Series(*dsp.freqz(kerbp, worN=int(1e4), fs=dmx.freq)[::-1]).slice(0, 1e3)
 
     mon = sers["mon1"] + sers["mon2"]
@@ -40,12 +47,24 @@ def main(args):
     # x_sta_poly = np.polynomial.Polynomial.fit(*x_sta.slice(tau, 3*tau).xy, deg=2)
     # x_sta_beg = x_sta.slice(0, tau)
     # x_sta_beg.y[:] = x_sta_poly(x_sta_beg.x)
-    
+
     sers['x_static'] = x_sta
     # sers['x1'] = dmx - x_sta
     sers['x'] = dmx.filter(kerbp)
     # sers['x2'] = dmx.filter(kerbp2)
     sers['mon'] = mon
+    return sers
+
+def main(args):
+    for path in collect(args.file):
+        show(path, args)
+
+def show(path, args):
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    if args.params: print(data["params"])
+    if args.settings: print(data["settings"])
+    sers = process(data)
 
     fig, _ = plt.subplots(3)
     axs = fig.axes
@@ -56,10 +75,82 @@ def main(args):
     # axs[2].loglog(*sers['x'].slice(0, 0.1).fft().abs().xy)
     plt.show()
 
+def output_path(path: Path, out_dir=None):
+    out_dir = Path(out_dir) if out_dir else path.parent
+    return out_dir / (path.stem + '_proc.npz')
+
+def process_file(path: Path, out_path: Path):
+    '''Process a single file and save `x`, `x_static` and `monfit` as columns
+    sharing time column `t`'''
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    sers = process(data)
+    t = sers['x'].x
+    cols = {k: sers[k].y for k in ('x', 'x_static', 'monfit')}
+    for k, y in cols.items():
+        if len(y) != len(t):
+            raise ValueError(f"Column {k} has {len(y)} samples, time column has {len(t)}")
+    out_path.parent.mkdir(exist_ok=True, parents=True)
+    # Write to a temporary file first, so an interrupted write doesn't leave
+    # a truncated output that looks up to date
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    with tmp_path.open("wb") as f:
+        np.savez(f, t=t, **cols)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+def collect(patterns):
+    '''Files matching any of `patterns` (paths, directories or glob patterns).
+    Directories and glob patterns yield only `.pickle` files.'''
+    paths = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.glob('*.pickle'))
+        elif path.exists():
+            matches = [path]
+        else:
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=True)
+                             if p.endswith('.pickle'))
+        if not matches:
+            raise FileNotFoundError(f"No data files match '{pattern}'")
+        paths += matches
+    return list(dict.fromkeys(paths))
+
+def batch(args):
+    jobs = []
+    for path in collect(args.file):
+        out_path = output_path(path, args.output)
+        if not args.force and out_path.exists() \
+                and out_path.stat().st_mtime > path.stat().st_mtime:
+            continue
+        jobs.append((path, out_path))
+    print(f"{len(jobs)} file(s) to process")
+    with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+        futures = {ex.submit(process_file, *job): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                print(fut.result())
+            except Exception as e:
+                print(f"{path}: {type(e).__name__}: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Program for processing measurement results")
-    parser.add_argument("file", help="File with data to process")
+    parser.add_argument("file", nargs='+'
+        , help="Files with data to process (directories or glob patterns are accepted)")
     parser.add_argument("-p", "--params", action="store_true", help="Show measurement parameters")
     parser.add_argument("-e", "--settings", action="store_true", help="Show measurement settings")
+    parser.add_argument("-b", "--batch", action="store_true"
+        , help="Process all files headlessly, saving results to '<name>_proc.npz'")
+    parser.add_argument("-o", "--output", default=None
+        , help="Output directory in batch mode (defaults to input file directory)", metavar="DIR")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count()
+        , help="Number of parallel processes in batch mode", metavar="N")
+    parser.add_argument("-f", "--force", action="store_true"
+        , help="Process files even if their outputs are up to date")
     args = parser.parse_args()
-    main(args)
+    if args.batch:
+        batch(args)
+    else:
+        main(args)
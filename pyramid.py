@@ -0,0 +1,111 @@
+import os
+import numpy as np
+from pathlib import Path
+from labpy.types import Series, DataList
+
+factor = 4
+'''int: Decimation factor between consecutive pyramid levels'''
+min_len = 16
+'''int: Pyramid levels are built until they are shorter than this'''
+
+def path_for(data_path):
+    '''Pyramid file stored alongside data file `data_path`'''
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.stem + '_pyramid.npz')
+
+def build(y, factor=factor, min_len=min_len):
+    '''Multi-resolution min/max decimation of `y`.
+    Returns list of levels, where level 0 is `y` itself and level k is an array
+    of shape (2, ceil(len(y) / factor**k)) with minima and maxima of consecutive
+    blocks of `factor**k` samples.'''
+    y = np.asarray(y)
+    levels = [y]
+    lo, hi = y, y
+    while len(lo) > min_len:
+        idx = np.arange(0, len(lo), factor)
+        lo, hi = np.minimum.reduceat(lo, idx), np.maximum.reduceat(hi, idx)
+        levels.append(np.stack([lo, hi]))
+    return levels
+
+def save(data: DataList, path, factor=factor):
+    '''Build pyramids for every Series channel of every shot in `data` and save them to `path`'''
+    arrays = {'factor': np.array(factor)}
+    for shot, entry in enumerate(data):
+        for ch, ser in entry.items():
+            if not isinstance(ser, Series):
+                continue
+            key = f'{shot}/{ch}'
+            arrays[key + '/x0'] = np.array(ser.x[0])
+            arrays[key + '/dx'] = np.array(ser.dx)
+            arrays[key + '/n'] = np.array(len(ser.y))
+            for level, arr in enumerate(build(ser.y, factor)):
+                arrays[f'{key}/{level}'] = arr
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    # Write to a temporary file first, so an interrupted build doesn't leave
+    # a truncated pyramid that looks up to date
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open("wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+class Pyramid:
+    '''Read access to a pyramid file. Arrays are loaded lazily on first use.'''
+
+    def __init__(self, path):
+        self._npz = np.load(path)
+        self._cache = {}
+        self.factor = int(self._npz['factor'])
+        self.index = {}
+        '''dict[tuple, int]: Number of levels for each (shot, channel)'''
+        for key in self._npz.files:
+            parts = key.split('/')
+            if len(parts) == 3 and parts[2].isdigit():
+                idx = (int(parts[0]), parts[1])
+                self.index[idx] = max(self.index.get(idx, 0), int(parts[2]) + 1)
+
+    @property
+    def shots(self):
+        return sorted({shot for shot, _ in self.index})
+
+    def channels(self, shot=0):
+        return [ch for s, ch in self.index if s == shot]
+
+    def _get(self, key):
+        if key not in self._cache:
+            self._cache[key] = self._npz[key]
+        return self._cache[key]
+
+    def span(self, shot, ch):
+        '''Time span (start, stop) of channel `ch` of `shot`'''
+        x0, dx = float(self._get(f'{shot}/{ch}/x0')), float(self._get(f'{shot}/{ch}/dx'))
+        return x0, x0 + dx * int(self._get(f'{shot}/{ch}/n'))
+
+    def level_for(self, shot, ch, l, r, width):
+        '''Coarsest level that still has at least `width` points in window [l, r]'''
+        dx = float(self._get(f'{shot}/{ch}/dx'))
+        n = (r - l) / dx
+        level = int(np.floor(np.log(max(n / width, 1.)) / np.log(self.factor)))
+        return min(level, self.index[(shot, ch)] - 1)
+
+    def window(self, shot, ch, l=None, r=None, width=1000):
+        '''Envelope of channel `ch` of `shot` within time window [l, r] decimated
+        to roughly `width` points (but not fewer). Returns `x`, `lo` and `hi`
+        arrays (`lo` and `hi` are the same for full resolution data).'''
+        start, stop = self.span(shot, ch)
+        l = start if l is None else max(l, start)
+        r = stop if r is None else min(r, stop)
+        level = self.level_for(shot, ch, l, r, width)
+        dx0 = float(self._get(f'{shot}/{ch}/dx'))
+        x0, dx = start, dx0 * self.factor ** level
+        arr = self._get(f'{shot}/{ch}/{level}')
+        n = arr.shape[-1]
+        i0 = min(max(int(np.floor((l - x0) / dx)), 0), n)
+        i1 = min(max(int(np.ceil((r - x0) / dx)) + 1, i0), n)
+        if level == 0:
+            lo = hi = arr[i0:i1]
+            x = x0 + dx * np.arange(i0, i1)
+        else:
+            lo, hi = arr[0, i0:i1], arr[1, i0:i1]
+            x = x0 + dx * (np.arange(i0, i1) + 0.5) - dx0 / 2
+        return x, lo, hi
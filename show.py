@@ -1,15 +1,88 @@
 import argparse
+import sys
 import pickle
+from pathlib import Path
+import numpy as np
+import matplotlib.pyplot as plt
+import pyramid
 from model import Model
 from labpy.types import DataList
 
-def main(args):    
+def load_pyramid(file):
+    path = pyramid.path_for(file)
+    if not path.exists() or Path(file).stat().st_mtime > path.stat().st_mtime:
+        print(f"Building pyramid {path}")
+        with open(file, "rb") as f:
+            data = pickle.load(f)
+        pyramid.save(data, path)
+    return pyramid.Pyramid(path)
+
+def plot(args):
+    pyr = load_pyramid(args.file)
+    shots = args.shots if args.shots else [0]
+    for shot in shots:
+        if shot not in pyr.shots:
+            sys.exit(f"No shot {shot}, available shots: 0-{pyr.shots[-1]}")
+    chs = args.channels if args.channels else pyr.channels(shots[0])
+    for shot in shots:
+        for ch in chs:
+            if ch not in pyr.channels(shot):
+                sys.exit(f"No channel '{ch}' in shot {shot}, available: {', '.join(pyr.channels(shot))}")
+    fig, axs = plt.subplots(len(chs), sharex=True, squeeze=False)
+    axs = axs[:, 0]
+    fig.set_tight_layout(True)
+
+    def redraw(ax):
+        l, r = ax.get_xlim()
+        width = ax.bbox.width
+        for line in ax.get_lines():
+            line.remove()
+        for coll in ax.collections[:]:
+            coll.remove()
+        ymin, ymax = np.inf, -np.inf
+        for shot in shots:
+            x, lo, hi = pyr.window(shot, ax.ch, l, r, width)
+            if len(x):
+                ymin, ymax = min(ymin, np.min(lo)), max(ymax, np.max(hi))
+            if lo is hi:
+                ax.plot(x, lo, label=f'{shot}', color=f'C{shot % 10}')
+            else:
+                ax.fill_between(x, lo, hi, step='mid', label=f'{shot}', color=f'C{shot % 10}')
+        if ymin <= ymax:
+            margin = 0.05 * (ymax - ymin) or 0.05 * abs(ymax) or 1.
+            ax.set_ylim(ymin - margin, ymax + margin)
+        ax.figure.canvas.draw_idle()
+
+    for ax, ch in zip(axs, chs):
+        ax.ch = ch
+        ax.set_ylabel(ch)
+        spans = [pyr.span(shot, ch) for shot in shots]
+        start, stop = min(s[0] for s in spans), max(s[1] for s in spans)
+        if args.window:
+            start, stop = args.window
+        ax.set_xlim(start, stop)
+        redraw(ax)
+        ax.callbacks.connect('xlim_changed', redraw)
+    axs[0].legend(loc='best')
+    plt.show()
+
+def main(args):
+    if args.plot:
+        plot(args)
+        return
     with open(args.file, "rb") as f:
         data = pickle.load(f)
-    print(data)    
+    print(data)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Program for displaying DataList measurement")
     parser.add_argument("file", help="File with data to show")
+    parser.add_argument("-p", "--plot", action="store_true"
+        , help="Plot traces using min/max pyramid (built if missing)")
+    parser.add_argument("-s", "--shots", type=int, nargs='+', default=None
+        , help="Shots to plot (overlaid, defaults to first shot)")
+    parser.add_argument("-c", "--channels", nargs='+', default=None, help="Channels to plot")
+    parser.add_argument("-w", "--window", type=float, nargs=2, default=None
+        , help="Initial time window", metavar=("START", "STOP"))
     args = parser.parse_args()
     main(args)
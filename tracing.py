@@ -0,0 +1,87 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+hist_bins = np.logspace(-6, 2, 25)
+'''Histogram bin edges in seconds (3 bins per decade, 1 us to 100 s)'''
+
+class Tracer:
+    '''Records timed spans of named stages. Spans may be nested and carry
+    arbitrary attributes (e.g. shot and scan point ids). Exclusive (self) time
+    of a span excludes time spent in spans nested in it.
+    Disabled tracer records nothing and adds only a function call per span.'''
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = []
+        '''list[tuple]: Recorded spans as (name, start_ns, duration_ns, self_ns, thread_id, attrs)'''
+        self._t0 = time.perf_counter_ns()
+        self._stack = []
+        self._null = contextlib.nullcontext()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return self._null
+        return self._span(name, attrs)
+
+    @contextlib.contextmanager
+    def _span(self, name, attrs):
+        frame = [0]
+        self._stack.append(frame)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            dur = time.perf_counter_ns() - start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][0] += dur
+            self.spans.append((name, start - self._t0, dur, dur - frame[0],
+                               threading.get_ident(), attrs))
+
+    def clear(self):
+        self.spans = []
+        self._t0 = time.perf_counter_ns()
+
+    def rewind(self, n):
+        '''Drop spans recorded after the first `n`'''
+        del self.spans[n:]
+
+    def durations(self, exclusive=False):
+        '''dict[str, np.ndarray]: Span durations (or exclusive times) in seconds grouped by name'''
+        durs = {}
+        for name, _, dur, self_dur, _, _ in self.spans:
+            durs.setdefault(name, []).append(self_dur if exclusive else dur)
+        return {k: np.array(v) * 1e-9 for k, v in durs.items()}
+
+    def summary(self):
+        '''Aggregate spans into per-stage statistics and histograms of durations
+        (bin edges in `hist_bins`). Durations are inclusive of nested spans,
+        `self total` and `self median` are exclusive.'''
+        stages = {}
+        excl = self.durations(exclusive=True)
+        for name, d in self.durations().items():
+            stages[name] = {
+                'n': len(d), 'total': float(np.sum(d)), 'mean': float(np.mean(d)),
+                'self total': float(np.sum(excl[name])),
+                'self median': float(np.median(excl[name])),
+                'min': float(np.min(d)), 'max': float(np.max(d)),
+                'p50': float(np.percentile(d, 50)), 'p90': float(np.percentile(d, 90)),
+                'hist': np.histogram(d, bins=hist_bins)[0].tolist(),
+            }
+        return {'bins': hist_bins.tolist(), 'stages': stages}
+
+    def export_chrome(self, path):
+        '''Save spans in Chrome trace event format (viewable in chrome://tracing or Perfetto)'''
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'ts': start / 1e3, 'dur': dur / 1e3,
+                   'pid': pid, 'tid': tid, 'args': attrs}
+                  for name, start, dur, _, tid, attrs in self.spans]
+        savepath = Path(path)
+        savepath.parent.mkdir(exist_ok=True, parents=True)
+        with savepath.open("w") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)